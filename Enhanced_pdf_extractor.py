@@ -2,11 +2,114 @@
 import fitz  # PyMuPDF
 import re
 import json
-import statistics
 import os
 import argparse
-from collections import defaultdict, Counter
-from typing import List, Dict, Tuple, Optional
+import hashlib
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice, takewhile
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, NamedTuple
+
+# Bump when extraction logic changes so stale cached results are ignored
+_CACHE_VERSION = 'v1'
+
+# Very strict heading patterns - only the most obvious structural indicators
+# Only strong numbered sections with content words
+_H1_DEF_SRC = r'(\d+)\.\s+([A-Z][a-z].*?[a-z])'
+_H2_DEF_SRC = r'(\d+)\.(\d+)\s+([A-Z][a-z].*?[a-z])'
+# Special sections that are definitely H1 (must be standalone)
+_H1_SPECIAL_SRC = r'(Table of Contents|References|Bibliography|Acknowledgements?|Abstract|Summary|Introduction|Conclusion|Appendix [A-Z])'
+
+_H1_DEF = re.compile(rf'^\s*{_H1_DEF_SRC}\s*$', re.IGNORECASE)
+_H2_DEF = re.compile(rf'^\s*{_H2_DEF_SRC}\s*$', re.IGNORECASE)
+_H1_SPECIAL = re.compile(rf'^\s*{_H1_SPECIAL_SRC}\s*$', re.IGNORECASE)
+
+# All three patterns fused into one match; alternatives are tried in the
+# same priority order as the old cascade and dispatched on `lastgroup`
+_HEADING_RE = re.compile(
+    rf'^\s*(?:(?P<h1>{_H1_DEF_SRC})|(?P<h2>{_H2_DEF_SRC})|(?P<sp>{_H1_SPECIAL_SRC}))\s*$',
+    re.IGNORECASE
+)
+_HEADING_LEVELS = {
+    'h1': ('H1', 1.0),  # Definitive
+    'h2': ('H2', 1.0),  # Definitive
+    'sp': ('H1', 0.9),  # Very strong
+}
+
+# Document type detection patterns
+DOCUMENT_TYPE_INDICATORS = {
+    'form': ['application', 'form', 'for:', 'date:', 'name:', 'address:', 'rsvp:', 'signature'],
+    'invitation': ['invited', 'party', 'celebration', 'event', 'rsvp', 'please join'],
+    'flyer': ['sale', 'discount', 'special offer', 'limited time', 'call now'],
+    'certificate': ['certificate', 'certifies', 'completion', 'achievement'],
+}
+
+# Text that should NEVER be considered headings
+NEVER_HEADINGS = [
+    'www.', 'http', '.com', '.org', 'email', '@',
+    'copyright', '©', 'page', 'version', 'date:',
+    'rsvp:', 'address:', 'phone:', 'contact:',
+    '___', '---', '...', 'signature', 'print name'
+]
+
+NAV_INDICATORS = [
+    'page ', 'copyright', '©', 'www.', 'http', '@',
+    '.com', '.org', 'version', 'date:', 'revised',
+    'rsvp:', 'phone:', 'address:', 'email:'
+]
+
+
+def _compile_alternation(words: List[str], flags: int = 0) -> re.Pattern:
+    """Compile a list of literal substrings into a single alternation regex."""
+    return re.compile('|'.join(re.escape(w) for w in words), flags)
+
+
+# One scan per string instead of one `in text.lower()` per indicator
+_NEVER_RE = _compile_alternation(NEVER_HEADINGS, re.IGNORECASE)
+_NAV_RE = _compile_alternation(NAV_INDICATORS, re.IGNORECASE)
+# Structured titles also skip text starting with 'page' ('copyright' and
+# '©' are already navigation substrings), folded into the same scan
+_NAV_TITLE_SKIP_RE = re.compile(r'^page|' + _NAV_RE.pattern, re.IGNORECASE)
+# Every document type's indicators in one scan. The lookahead reports the
+# longest indicator starting at each position; any shorter indicator found
+# there is a prefix of it, so each literal credits all indicators it contains.
+# Matched against already-lowercased text, so no IGNORECASE needed.
+_INDICATORS = sorted({i for indicators in DOCUMENT_TYPE_INDICATORS.values() for i in indicators},
+                     key=len, reverse=True)
+_DOC_TYPE_RE = re.compile('(?=(' + '|'.join(re.escape(i) for i in _INDICATORS) + '))')
+_INDICATOR_CREDITS = {
+    literal: [(doc_type, indicator)
+              for doc_type, indicators in DOCUMENT_TYPE_INDICATORS.items()
+              for indicator in indicators if indicator in literal]
+    for literal in _INDICATORS
+}
+# Characters of the previous block kept when scanning for indicators, so
+# multi-word indicators split across two lines are still found
+_DOC_TYPE_OVERLAP = max(len(i) for indicators in DOCUMENT_TYPE_INDICATORS.values() for i in indicators) - 1
+# Blocks joined per indicator scan; bounds memory while avoiding a
+# lower() and concatenation per block
+_SCAN_BATCH = 256
+# Every title strategy looks at no more than the first 10 blocks
+_TITLE_BLOCKS = 10
+_TITLE_PUNCTUATION = frozenset('.,!?')
+# Text-only extraction flags: the "dict" default also sets TEXT_PRESERVE_IMAGES,
+# which decodes every image into the result even though only text is read
+_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+# Document types whose title is picked by font size and weight
+_VISUAL_DOC_TYPES = ('invitation', 'flyer', 'form')
+
+class TextBlock(NamedTuple):
+    """One line of text with its position and font information, flattened."""
+    text: str
+    page: int
+    bbox: Tuple[float, float, float, float]
+    size: float
+    is_bold: bool
+    x: float
+    y: float
+    width: float
+    height: float
+
 
 class EnhancedPDFOutlineExtractor:
    
@@ -16,45 +119,79 @@ class EnhancedPDFOutlineExtractor:
         Enhanced PDF outline extractor optimized for complex fonts and form documents.
         Focuses on accurate title detection and avoiding false heading classification.
         """
-        # Very strict heading patterns - only the most obvious structural indicators
         self.heading_patterns = {
-            # Only strong numbered sections with content words
-            'h1_definite': re.compile(r'^\s*(\d+)\.\s+([A-Z][a-z].*?[a-z])\s*$', re.IGNORECASE),
-            'h2_definite': re.compile(r'^\s*(\d+)\.(\d+)\s+([A-Z][a-z].*?[a-z])\s*$', re.IGNORECASE),
-
-            # Special sections that are definitely H1 (must be standalone)
-            'h1_special': re.compile(r'^\s*(Table of Contents|References|Bibliography|Acknowledgements?|Abstract|Summary|Introduction|Conclusion|Appendix [A-Z])\s*$', re.IGNORECASE),
+            'h1_definite': _H1_DEF,
+            'h2_definite': _H2_DEF,
+            'h1_special': _H1_SPECIAL,
         }
 
-        # Document type detection patterns
-        self.document_type_indicators = {
-            'form': ['application', 'form', 'for:', 'date:', 'name:', 'address:', 'rsvp:', 'signature'],
-            'invitation': ['invited', 'party', 'celebration', 'event', 'rsvp', 'please join'],
-            'flyer': ['sale', 'discount', 'special offer', 'limited time', 'call now'],
-            'certificate': ['certificate', 'certifies', 'completion', 'achievement'],
-        }
+        self.document_type_indicators = DOCUMENT_TYPE_INDICATORS
+        self.never_headings = NEVER_HEADINGS
 
-        # Text that should NEVER be considered headings
-        self.never_headings = [
-            'www.', 'http', '.com', '.org', 'email', '@', 
-            'copyright', '©', 'page', 'version', 'date:',
-            'rsvp:', 'address:', 'phone:', 'contact:',
-            '___', '---', '...', 'signature', 'print name'
-        ]
+    def scan_blocks(self, blocks: Iterable[TextBlock]) -> Dict:
+        """
+        Consume blocks once, collecting everything the later stages need.
+        Only the leading blocks and structural heading candidates are retained.
+        """
+        total_blocks = 0
+        total_text_length = 0
+        found = set()
+        head_blocks = []
+        candidates = []
+        pending = []
+        tail = ''
+
+        def scan_pending():
+            # Join a batch of texts and lower-case it once, carrying a short
+            # tail into the next batch so no indicator is cut in half
+            nonlocal tail
+            text_lower = ' '.join(pending).lower()
+            if tail:
+                text_lower = tail + ' ' + text_lower
+            found.update(_DOC_TYPE_RE.findall(text_lower))
+            tail = text_lower[-_DOC_TYPE_OVERLAP:]
+            pending.clear()
 
-    def detect_document_type(self, blocks: List[Dict]) -> str:
-        """Detect the type of document to adjust processing strategy."""
-        all_text = ' '.join([block['text'].lower() for block in blocks])
+        for block in blocks:
+            text = block.text
+            total_blocks += 1
+            total_text_length += len(text)
+
+            pending.append(text)
+            if len(pending) >= _SCAN_BATCH:
+                scan_pending()
+
+            if len(head_blocks) < _TITLE_BLOCKS:
+                head_blocks.append(block)
+
+            if _HEADING_RE.match(text):
+                candidates.append(block)
+
+        if pending:
+            scan_pending()
 
-        # Count indicators for each document type
-        type_scores = {}
-        for doc_type, indicators in self.document_type_indicators.items():
-            score = sum(1 for indicator in indicators if indicator in all_text)
-            type_scores[doc_type] = score
+        type_hits = {doc_type: set() for doc_type in DOCUMENT_TYPE_INDICATORS}
+        for literal in found:
+            for doc_type, indicator in _INDICATOR_CREDITS[literal]:
+                type_hits[doc_type].add(indicator)
 
-        # Determine document characteristics
-        total_blocks = len(blocks)
-        avg_text_length = sum(len(block['text']) for block in blocks) / max(total_blocks, 1)
+        return {
+            'total_blocks': total_blocks,
+            'avg_text_length': total_text_length / max(total_blocks, 1),
+            'type_scores': {doc_type: len(hits) for doc_type, hits in type_hits.items()},
+            'head_blocks': head_blocks,
+            'candidates': candidates,
+        }
+
+    def detect_document_type(self, blocks: List[TextBlock]) -> str:
+        """Detect the type of document to adjust processing strategy."""
+        return self.classify_document_type(self.scan_blocks(blocks))
+
+    def classify_document_type(self, stats: Dict) -> str:
+        """Pick a document type from the statistics gathered by scan_blocks."""
+        type_scores = stats['type_scores']
+        total_blocks = stats['total_blocks']
+        avg_text_length = stats['avg_text_length']
 
         # Simple heuristics for document type
         if total_blocks < 20 and avg_text_length < 50:
@@ -71,121 +208,127 @@ class EnhancedPDFOutlineExtractor:
         else:
             return 'standard_document'
 
-    def extract_text_blocks(self, pdf_path: str) -> List[Dict]:
+    def extract_text_blocks(self, pdf_path: str) -> List[TextBlock]:
         """Extract text blocks with enhanced font information."""
+        return list(self.iter_text_blocks(pdf_path))
+
+    def iter_text_blocks(self, pdf_path: str, detailed: bool = True,
+                         max_pages: Optional[int] = None) -> Iterator[TextBlock]:
+        """
+        Yield text blocks page by page. With `detailed=False` lines come from the
+        much cheaper "blocks" extraction and carry default font information.
+        """
         doc = fitz.open(pdf_path)
-        text_blocks = []
+        try:
+            page_count = len(doc) if max_pages is None else min(len(doc), max_pages)
+
+            for page_num in range(page_count):
+                page = doc[page_num]
+
+                if detailed:
+                    yield from self._iter_detailed_page_blocks(page, page_num + 1)
+                else:
+                    yield from self._iter_simple_page_blocks(page, page_num + 1)
+
+                # The page's text structures died with the inner generator;
+                # drop the page too so at most one page is alive at a time
+                page = None
+        finally:
+            # Also runs when a consumer stops early (e.g. islice)
+            doc.close()
+
+    def _iter_detailed_page_blocks(self, page, page_number: int) -> Iterator[TextBlock]:
+        """Yield one block per line of the page, with font size and boldness."""
+        try:
+            # Method 1: Detailed text extraction with font info
+            text_dict = page.get_text("dict", flags=_TEXT_FLAGS)
+        except RuntimeError:
+            # Fallback: Simple block extraction when MuPDF cannot build the page
+            yield from self._iter_simple_page_blocks(page, page_number)
+            return
+
+        # Malformed entries are skipped individually rather than failing the page
+        for block in text_dict.get("blocks", ()):
+            for line in block.get("lines", ()):
+                bbox = line.get("bbox")
+                if not bbox:
+                    continue
+
+                spans = line.get("spans", ())
+                line_text = "".join([span.get("text", "") for span in spans])
+
+                if line_text.strip():
+                    font_sizes = [span.get("size", 12) for span in spans]
+                    # Check if text is bold (flags & 16 means bold)
+                    is_bold = any(span.get("flags", 0) & 16 for span in spans)
+                    avg_font_size = sum(font_sizes) / len(font_sizes) if font_sizes else 12
+
+                    x0, y0, x1, y1 = bbox
+                    yield TextBlock(line_text.strip(), page_number, bbox, avg_font_size, is_bold,
+                                    x0, y0, x1 - x0, y1 - y0)
+
+    def _iter_simple_page_blocks(self, page, page_number: int) -> Iterator[TextBlock]:
+        """
+        Yield one block per line using the lightweight "blocks" extraction.
+        Lines share their block's bbox and get default font information.
+        """
+        for block in page.get_text("blocks", flags=_TEXT_FLAGS):
+            # Skip image blocks (block type 1)
+            if len(block) < 7 or block[6] != 0 or not block[4]:
+                continue
 
-        for page_num in range(len(doc)):
-            page = doc[page_num]
+            x0, y0, x1, y1 = block[:4]
+            for line_text in block[4].split('\n'):
+                text = line_text.strip()
+                if text:
+                    yield TextBlock(text, page_number, (x0, y0, x1, y1), 12, False,
+                                    x0, y0, x1 - x0, y1 - y0)
 
-            # Try multiple extraction methods for better accuracy
-            try:
-                # Method 1: Detailed text extraction with font info
-                text_dict = page.get_text("dict")
-                for block in text_dict["blocks"]:
-                    if "lines" in block:
-                        for line in block["lines"]:
-                            line_text = ""
-                            font_sizes = []
-                            is_bold = False
-
-                            for span in line["spans"]:
-                                line_text += span["text"]
-                                font_sizes.append(span.get("size", 12))
-                                # Check if text is bold (flags & 16 means bold)
-                                if span.get("flags", 0) & 16:
-                                    is_bold = True
-
-                            if line_text.strip():
-                                avg_font_size = sum(font_sizes) / len(font_sizes) if font_sizes else 12
-
-                                text_blocks.append({
-                                    'text': line_text.strip(),
-                                    'page': page_num + 1,
-                                    'bbox': line["bbox"],
-                                    'font_info': {
-                                        'size': avg_font_size,
-                                        'is_bold': is_bold,
-                                        'flags': 16 if is_bold else 0
-                                    },
-                                    'position': {
-                                        'x': line["bbox"][0],
-                                        'y': line["bbox"][1],
-                                        'width': line["bbox"][2] - line["bbox"][0],
-                                        'height': line["bbox"][3] - line["bbox"][1]
-                                    }
-                                })
-            except:
-                # Fallback: Simple block extraction
-                blocks = page.get_text("blocks")
-                for block in blocks:
-                    if len(block) >= 6 and block[4]:
-                        text = block[4].strip()
-                        if text:
-                            text_blocks.append({
-                                'text': text,
-                                'page': page_num + 1,
-                                'bbox': block[:4],
-                                'font_info': {'size': 12, 'is_bold': False, 'flags': 0},
-                                'position': {
-                                    'x': block[0],
-                                    'y': block[1],
-                                    'width': block[2] - block[0],
-                                    'height': block[3] - block[1]
-                                }
-                            })
-
-        doc.close()
-        return text_blocks
-
-    def extract_title_enhanced(self, blocks: List[Dict], doc_type: str) -> str:
+    def extract_title_enhanced(self, blocks: List[TextBlock], doc_type: str) -> str:
         """Enhanced title extraction based on document type and visual hierarchy."""
         if not blocks:
             return "Document Title"
 
         # Strategy varies by document type
-        if doc_type in ['invitation', 'flyer', 'form']:
+        if doc_type in _VISUAL_DOC_TYPES:
             return self._extract_title_from_visual_document(blocks)
         elif doc_type in ['complex_document', 'standard_document']:
             return self._extract_title_from_structured_document(blocks)
         else:
             return self._extract_title_from_simple_document(blocks)
 
-    def _extract_title_from_visual_document(self, blocks: List[Dict]) -> str:
+    def _first_page_blocks(self, blocks: Iterable[TextBlock], limit: int) -> List[TextBlock]:
+        """Return up to `limit` leading page-1 blocks; blocks are page-ordered."""
+        return list(islice(takewhile(lambda b: b.page == 1, blocks), limit))
+
+    def _extract_title_from_visual_document(self, blocks: List[TextBlock]) -> str:
         """Extract title from visually-designed documents like invitations."""
         # Look for largest font size in first few blocks
-        first_page_blocks = [b for b in blocks if b['page'] == 1][:10]
+        first_page_blocks = self._first_page_blocks(blocks, 10)
 
         # Find the block with largest font size that looks like a title
         best_candidate = None
         best_score = 0
 
         for block in first_page_blocks:
-            text = block['text'].strip()
-            font_size = block['font_info']['size']
-            is_bold = block['font_info']['is_bold']
+            text = block.text.strip()
+            text_len = len(text)
+            font_size = block.size
 
             # Skip obvious non-titles
-            if (len(text) < 3 or 
-                any(indicator in text.lower() for indicator in self.never_headings) or
-                text.lower().startswith(('page', 'copyright', '©'))):
+            # (never-headings also covers the 'page'/'copyright'/'©' prefixes)
+            if text_len < 3 or _NEVER_RE.search(text) is not None:
                 continue
 
             # Score based on visual characteristics
-            score = 0
-            if font_size > 14:  # Larger font
-                score += font_size / 4
-            if is_bold:  # Bold text
-                score += 10
-            if len(text) > 5 and len(text) < 80:  # Reasonable title length
-                score += 5
-            if text.isupper():  # All caps
-                score += 8
-            if not any(char in text for char in '.,!?'):  # No punctuation
-                score += 3
-            if block['position']['y'] < 200:  # Top of page
-                score += 5
+            score = (
+                (font_size / 4 if font_size > 14 else 0) +          # Larger font
+                (10 if block.is_bold else 0) +                        # Bold text
+                (5 if 5 < text_len < 80 else 0) +                     # Reasonable title length
+                (8 if text.isupper() else 0) +                        # All caps
+                (3 if _TITLE_PUNCTUATION.isdisjoint(text) else 0) +   # No punctuation
+                (5 if block.y < 200 else 0)                           # Top of page
+            )
 
             if score > best_score:
                 best_score = score
@@ -196,181 +339,214 @@ class EnhancedPDFOutlineExtractor:
 
         # Fallback: first meaningful text
         for block in first_page_blocks:
-            text = block['text'].strip()
-            if (len(text) > 3 and 
-                not any(indicator in text.lower() for indicator in self.never_headings)):
+            text = block.text.strip()
+            if (len(text) > 3 and
+                _NEVER_RE.search(text) is None):
                 return text
 
         return "Document Title"
 
-    def _extract_title_from_structured_document(self, blocks: List[Dict]) -> str:
+    def _extract_title_from_structured_document(self, blocks: List[TextBlock]) -> str:
         """Extract title from structured documents."""
-        first_page_blocks = [b for b in blocks if b['page'] == 1]
-
-        for block in first_page_blocks[:5]:
-            text = block['text'].strip()
-            if (len(text) > 10 and len(text) < 150 and 
-                not self._is_navigation_text(text) and
-                not text.lower().startswith(('page', 'copyright', '©'))):
+        for block in self._first_page_blocks(blocks, 5):
+            text = block.text.strip()
+            if (len(text) > 10 and len(text) < 150 and
+                _NAV_TITLE_SKIP_RE.search(text) is None):
                 return text
 
         return "Document Title"
 
-    def _extract_title_from_simple_document(self, blocks: List[Dict]) -> str:
+    def _extract_title_from_simple_document(self, blocks: List[TextBlock]) -> str:
         """Extract title from simple documents."""
         for block in blocks[:5]:
-            text = block['text'].strip()
+            text = block.text.strip()
             if len(text) > 5 and len(text) < 100:
                 return text
         return "Document Title"
 
-    def should_extract_headings(self, doc_type: str, blocks: List[Dict]) -> bool:
-        """Determine if we should attempt to extract headings from this document type."""
+    def should_extract_headings(self, doc_type: str, blocks: List[TextBlock],
+                                total_blocks: Optional[int] = None) -> bool:
+        """
+        Determine if we should attempt to extract headings from this document type.
+        `blocks` may be just the heading candidates when `total_blocks` is given.
+        """
         # Don't extract headings from forms, invitations, flyers, etc.
         if doc_type in ['form', 'invitation', 'flyer', 'certificate']:
             return False
 
         # Don't extract headings from very simple documents
-        if len(blocks) < 15:
+        if (len(blocks) if total_blocks is None else total_blocks) < 15:
             return False
 
-        # Check if document has any clear structural indicators
-        has_numbered_sections = any(
-            self.heading_patterns['h1_definite'].match(block['text']) or 
-            self.heading_patterns['h2_definite'].match(block['text'])
-            for block in blocks
-        )
-
-        has_special_sections = any(
-            self.heading_patterns['h1_special'].match(block['text'])
-            for block in blocks
-        )
+        # Check if document has any clear structural indicators (numbered or special sections)
+        for block in blocks:
+            if _HEADING_RE.match(block.text):
+                return True
 
-        return has_numbered_sections or has_special_sections
+        return False
 
-    def calculate_ultra_conservative_heading_score(self, block: Dict, doc_type: str) -> Tuple[str, float]:
+    def calculate_ultra_conservative_heading_score(self, block: TextBlock, doc_type: str) -> Tuple[str, float]:
         """Ultra-conservative heading detection - only obvious structural elements."""
-        text = block['text'].strip()
+        text = block.text.strip()
 
         # Immediate disqualifiers
         if (len(text) < 4 or len(text) > 100 or
-            any(never in text.lower() for never in self.never_headings) or
+            _NEVER_RE.search(text) is not None or
             '___' in text or '---' in text or '...' in text):
             return 'CONTENT', 0.0
 
-        # Only definitive patterns get high scores
-        scores = {'H1': 0, 'H2': 0, 'CONTENT': 10}
+        # Only definitive patterns qualify as headings in ultra-conservative mode
+        m = _HEADING_RE.match(text)
+        if m:
+            return _HEADING_LEVELS[m.lastgroup]
 
-        # Pattern-based scoring (VERY HIGH REQUIREMENTS)
-        if self.heading_patterns['h1_definite'].match(text):
-            scores['H1'] = 100  # Definitive
-        elif self.heading_patterns['h2_definite'].match(text):
-            scores['H2'] = 100  # Definitive
-        elif self.heading_patterns['h1_special'].match(text):
-            scores['H1'] = 90   # Very strong
-        else:
-            # No other patterns qualify as headings in ultra-conservative mode
-            pass
-
-        # Find highest score with minimum threshold
-        if scores['H1'] >= 80:
-            return 'H1', min(scores['H1'] / 100.0, 1.0)
-        elif scores['H2'] >= 80:
-            return 'H2', min(scores['H2'] / 100.0, 1.0)
-        else:
-            return 'CONTENT', 0.0
+        return 'CONTENT', 0.0
 
     def _is_navigation_text(self, text: str) -> bool:
         """Enhanced navigation text detection."""
-        text_lower = text.lower()
-        nav_indicators = [
-            'page ', 'copyright', '©', 'www.', 'http', '@',
-            '.com', '.org', 'version', 'date:', 'revised',
-            'rsvp:', 'phone:', 'address:', 'email:'
-        ]
-        return any(indicator in text_lower for indicator in nav_indicators)
+        return _NAV_RE.search(text) is not None
 
     def extract_outline(self, pdf_path: str) -> Dict:
         """
         Main extraction method with enhanced document type handling.
         """
-        # Extract text blocks
-        blocks = self.extract_text_blocks(pdf_path)
+        # Stream lightweight text blocks, keeping only what the later stages need
+        stats = self.scan_blocks(self.iter_text_blocks(pdf_path, detailed=False))
 
-        if not blocks:
+        if not stats['total_blocks']:
             return {"title": "Empty Document", "outline": []}
 
         # Detect document type
-        doc_type = self.detect_document_type(blocks)
+        doc_type = self.classify_document_type(stats)
+
+        # Only visual documents score titles by font, so only they need the
+        # detailed extraction, and only for the first page
+        head_blocks = stats['head_blocks']
+        if doc_type in _VISUAL_DOC_TYPES:
+            head_blocks = list(islice(self.iter_text_blocks(pdf_path, max_pages=1), _TITLE_BLOCKS))
 
         # Extract title using enhanced method
-        title = self.extract_title_enhanced(blocks, doc_type)
+        title = self.extract_title_enhanced(head_blocks, doc_type)
 
-        # Decide whether to extract headings based on document type
-        if not self.should_extract_headings(doc_type, blocks):
+        # Decide whether to extract headings based on document type.
+        # Only blocks matching a structural pattern were kept as candidates.
+        candidates = stats['candidates']
+        if not self.should_extract_headings(doc_type, candidates, stats['total_blocks']):
             return {
                 'title': title,
                 'outline': []  # No headings for forms/invitations/simple docs
             }
 
-        # Process blocks for heading detection (only for appropriate document types)
-        potential_headings = []
+        # Process candidates for heading detection (only for appropriate document types).
+        # Candidates arrive in page order, so keeping the first heading per text
+        # keeps its earliest page - the same one the old sort-then-dedup kept.
+        headings_by_text = {}
 
-        for block in blocks:
-            text = block['text'].strip()
+        for block in candidates:
+            text = block.text.strip()
+            if text in headings_by_text:
+                continue
 
             # Ultra-conservative heading detection
             level, confidence = self.calculate_ultra_conservative_heading_score(block, doc_type)
 
             if level != 'CONTENT' and confidence >= 0.8:  # Very high threshold
-                potential_headings.append({
+                headings_by_text[text] = {
                     'level': level,
                     'text': text,
-                    'page': block['page'],
-                    'confidence': confidence
-                })
-
-        # Sort by page and remove duplicates
-        potential_headings.sort(key=lambda x: (x['page'], x['text']))
-        final_headings = []
-
-        for heading in potential_headings:
-            # Avoid duplicates
-            if not any(h['text'] == heading['text'] for h in final_headings):
-                final_headings.append(heading)
-
-        # Format output
-        outline = []
-        for heading in final_headings:
-            outline.append({
-                'level': heading['level'],
-                'text': heading['text'],
-                'page': heading['page']
-            })
+                    'page': block.page
+                }
+
+        # Format output: by page, then text within a page
+        outline = sorted(headings_by_text.values(), key=lambda x: (x['page'], x['text']))
 
         return {
             'title': title,
             'outline': outline
         }
 
-# Main processing function
-def process_all_pdfs(input_dir: str = '/app/input', output_dir: str = '/app/output'):
-    """Process all PDF files with the enhanced extractor."""
-    import os
+def _file_digest(path: str) -> str:
+    """Content hash of a file, read in chunks."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _process_one_pdf(input_path: str, output_path: str, cache_dir: Optional[str] = None) -> Dict:
+    """
+    Extract one PDF and write its JSON; runs inside a worker process.
+    With `cache_dir`, results are reused for PDFs whose content was seen before.
+    """
+    cache_path = None
+    result = None
+
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"{_CACHE_VERSION}-{_file_digest(input_path)}.json")
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            result = None
+
+    if result is None:
+        # A fresh extractor per task keeps workers free of shared state
+        extractor = EnhancedPDFOutlineExtractor()
+        result = extractor.extract_outline(input_path)
+    else:
+        cache_path = None  # Already cached, nothing to write back
+
+    # The output comes first, so a cache fault can never cost an output file
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if cache_path:
+        # Best effort. Write then rename so concurrent workers never read a partial entry
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError, ValueError):
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+
+    return result
 
-    extractor = EnhancedPDFOutlineExtractor()
 
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith('.pdf'):
-            input_path = os.path.join(input_dir, filename)
-            output_filename = filename.replace('.pdf', '.json')
-            output_path = os.path.join(output_dir, output_filename)
+# Main processing function
+def process_all_pdfs(input_dir: str = '/app/input', output_dir: str = '/app/output',
+                     cache_dir: Optional[str] = None):
+    """
+    Process all PDF files with the enhanced extractor, one worker process per CPU.
+    Pass `cache_dir` to skip re-extracting PDFs whose content has not changed.
+    """
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    jobs = {}
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            filename = entry.name
+            if filename.lower().endswith('.pdf') and entry.is_file():
+                output_filename = filename.replace('.pdf', '.json')
+                output_path = os.path.join(output_dir, output_filename)
+                jobs[filename] = (entry.path, output_path, output_filename)
+
+    if not jobs:
+        return
+
+    with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as executor:
+        futures = {
+            executor.submit(_process_one_pdf, input_path, output_path, cache_dir): (filename, output_filename)
+            for filename, (input_path, output_path, output_filename) in jobs.items()
+        }
 
+        for future in as_completed(futures):
+            filename, output_filename = futures[future]
             try:
-                result = extractor.extract_outline(input_path)
-
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, indent=2, ensure_ascii=False)
+                result = future.result()
 
                 print(f"Processed: {filename} -> {output_filename}")
                 print(f"  Title: {result['title']}")
@@ -399,8 +575,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--input', default='input', help='Input directory with PDFs')
     parser.add_argument('--output', default='output', help='Output directory for JSONs')
+    parser.add_argument('--cache', default=None, help='Optional directory for cached results, keyed by PDF content')
     args = parser.parse_args()
-    process_all_pdfs(args.input, args.output)
+    process_all_pdfs(args.input, args.output, args.cache)
 
 
 
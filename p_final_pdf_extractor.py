@@ -4,182 +4,384 @@ import json
 import os
 import sys
 import re
-from typing import List, Dict, Tuple, Optional
-from collections import defaultdict, Counter
-import statistics
+import math
+import hashlib
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, NamedTuple
+from itertools import chain, repeat
+from collections import defaultdict, Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Patterns are compiled once at import time rather than looked up in the
+# re module cache on every call
+_WS_RE = re.compile(r'\s+')
+
+# Character-class tests done with str methods instead of a regex:
+# deleting digits and dashes leaves only whitespace for "numbers only" text
+# (no \s table needed: str.isspace matches what \s did), and a page number
+# is just str.isdecimal, which like \d accepts any Unicode decimal digit
+_NUM_ONLY_DELETE = str.maketrans('', '', '0123456789-')
+
+_HF_PATTERNS = (
+    r'^RFP: To Develop.*March 2003.*\d+$',
+    r'^\d+\s*$',  # Just page numbers
+    r'^March \d+, \d+$',  # Just dates
+)
+
+_HEADING_PATTERNS = (
+    r'^(Chapter|Section|Part|Appendix)\s+[IVX0-9]+',
+    r'^\d+\.\d*\s+[A-Z]',
+    r'^[A-Z][a-z]+.*:$',
+    r'^(Summary|Background|Introduction|Conclusion|Overview|Abstract)$',
+    r'^Phase\s+[IVX]+:?',
+    r'^Appendix\s+[A-Z]:',
+    r'^[A-Z][A-Z\s]+$',  # All caps
+    r'^(What|How|Why|Where|When)\s+[a-z]'
+)
+
+# Each pattern list fused into one alternation: one match call instead of N
+_HF_UNION = re.compile('|'.join(f'(?:{p})' for p in _HF_PATTERNS), re.IGNORECASE)
+_HEADING_UNION = re.compile('|'.join(f'(?:{p})' for p in _HEADING_PATTERNS))
+
+# str.startswith accepts a tuple and tests every prefix in C
+_BODY_STARTERS = ('The ', 'This ', 'It ', 'We ', 'Our ', 'In order', 'For the')
+_LOWERCASE_HEADING_STARTERS = ('e-', 'i.e.', 'etc.')
+_NON_TITLE_STARTERS = ('page ', 'chapter ', 'section ')
+
+# The grouping flags of get_text("blocks"), minus the preservation work
+_TEXT_FLAGS = fitz.TEXTFLAGS_BLOCKS & ~(fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE)
+
+# Pages whose extracted items are kept across extract_outline calls
+_PAGE_CACHE_SIZE = 128
+# Files whose cache key and page count are remembered
+_DOC_CACHE_SIZE = 128
+
+_APPENDIX_RE = re.compile(r'^Appendix\s+[A-Z]:')
+_NUMBERED_SUB_RE = re.compile(r'^\d+\.\d+\s+')
+_PHASE_RE = re.compile(r'^Phase\s+[IVX]+')
+_SECTION_HEADINGS = frozenset(("Summary", "Background", "Introduction", "Conclusion"))
+
+def _file_digest(path: str) -> str:
+    """Content hash of a file, read in chunks"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _trigrams(text: str) -> set:
+    """Distinct character trigrams of a string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class _SubstringIndex:
+    """
+    Seen texts indexed by character trigram, so finding a text that contains
+    (or is contained in) a query does not compare against every entry.
+    A substring's trigrams are always a subset of its container's, so the
+    filter never drops a real match; candidates are confirmed with `in`.
+    """
+    def __init__(self):
+        self.texts = []
+        self.trigram_counts = []
+        self.postings = defaultdict(list)  # trigram -> indices of texts containing it
+        self.short_texts = []  # too short to have any trigram
+
+    def add(self, text: str):
+        index = len(self.texts)
+        trigrams = _trigrams(text)
+        self.texts.append(text)
+        self.trigram_counts.append(len(trigrams))
+        if not trigrams:
+            self.short_texts.append(text)
+        for trigram in trigrams:
+            self.postings[trigram].append(index)
+
+    def overlaps(self, text: str) -> bool:
+        """Check if any indexed text contains `text` or is contained in it"""
+        trigrams = _trigrams(text)
+        if not trigrams:
+            return any(text in seen or seen in text for seen in self.texts)
+
+        shared = Counter()
+        for trigram in trigrams:
+            for index in self.postings.get(trigram, ()):
+                shared[index] += 1
+
+        for index, count in shared.items():
+            # Containment either way requires one trigram set to cover the other
+            if count == len(trigrams) or count == self.trigram_counts[index]:
+                seen = self.texts[index]
+                if text in seen or seen in text:
+                    return True
+
+        return any(seen in text for seen in self.short_texts)
+
+class TextItem(NamedTuple):
+    """A text block with its layout and font information"""
+    text: str
+    page: int
+    bbox: Tuple[float, float, float, float]
+    x: float
+    y: float
+    width: float
+    height: float
+    size: float
+    font: str
+    is_bold: bool
+    block_no: int
+    # Why cleaning drops this item ('header_footer' or 'number'). When set,
+    # the font fields are not computed: size 0.0, font '' and not bold
+    rejected: Optional[str] = None
 
 class p_FinalPDFOutlineExtractor:
     def __init__(self):
         self.debug = False
-
-    def extract_text_with_layout(self, pdf_path: str) -> List[Dict]:
-        """Extract text preserving layout information"""
-        doc = fitz.open(pdf_path)
-        all_text_items = []
-
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-
-            # Use blocks extraction which groups text better
-            blocks = page.get_text("blocks", sort=True)
-
-            for block in blocks:
-                if len(block) >= 5:  # Valid block format
-                    x0, y0, x1, y1, text, block_no, block_type = block[:7]
-
-                    # Clean up text
-                    text = text.strip()
-                    if text and len(text) >= 2:
-                        # Get detailed font info for this block
-                        font_info = self.get_block_font_info(page, (x0, y0, x1, y1))
-
-                        all_text_items.append({
-                            'text': text,
-                            'page': page_num + 1,
-                            'bbox': [x0, y0, x1, y1],
-                            'x': x0,
-                            'y': y0,
-                            'width': x1 - x0,
-                            'height': y1 - y0,
-                            'size': font_info.get('size', 12),
-                            'font': font_info.get('font', ''),
-                            'is_bold': font_info.get('is_bold', False),
-                            'block_no': block_no
-                        })
-
-        doc.close()
-        return all_text_items
-
-    def get_block_font_info(self, page, bbox) -> Dict:
-        """Get font information for a text block"""
+        # (document key, page number) -> extracted items, least recently used first
+        self._page_cache = OrderedDict()
+        # (path, size, mtime) -> [document key, page count or None], least recently
+        # used first; the page count lets fully cached files skip fitz.open
+        self._documents = OrderedDict()
+        # (path, size, mtime) -> content digest, for files that were ever hashed
+        self._digests = {}
+
+    def extract_text_with_layout(self, pdf_path: str) -> List[TextItem]:
+        """
+        Extract text preserving layout information. Items that cleaning will
+        drop are included but marked `rejected`, without font data.
+        """
+        return list(self.iter_text_items(pdf_path))
+
+    def iter_text_items(self, pdf_path: str) -> Iterator[TextItem]:
+        """Yield text items page by page, preserving layout information"""
+        document = self._get_document(pdf_path)
+        doc_key, page_count = document
+
+        doc = None
         try:
-            # Get detailed text info for this area
-            text_dict = page.get_text("dict")
-
-            sizes = []
-            fonts = []
-            flags = []
-
-            for block in text_dict.get("blocks", []):
-                if "lines" not in block:
-                    continue
-
-                block_bbox = block.get("bbox", [0, 0, 0, 0])
-                # Check if this block overlaps with our target bbox
-                if self.bboxes_overlap(bbox, block_bbox):
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            if span.get("text", "").strip():
-                                sizes.append(span.get("size", 12))
-                                fonts.append(span.get("font", ""))
-                                flags.append(span.get("flags", 0))
-
-            if sizes:
-                avg_size = statistics.mean(sizes)
-                dominant_font = max(set(fonts), key=fonts.count) if fonts else ""
-                is_bold = any(flag & 16 for flag in flags)  # Bold flag is 16 (2^4)
-
-                return {
-                    'size': avg_size,
-                    'font': dominant_font,
-                    'is_bold': is_bold
-                }
-
-        except Exception as e:
-            if self.debug:
-                print(f"Error getting font info: {e}")
+            if page_count is None:
+                doc = fitz.open(pdf_path)
+                page_count = document[1] = len(doc)
+
+            for page_num in range(page_count):
+                # Items are immutable, so cached ones can be handed out as-is
+                items = self._get_cached_page_items(doc_key, page_num)
+                if items is None:
+                    if doc is None:
+                        doc = fitz.open(pdf_path)
+                    items = self._extract_page_items(doc, doc_key, page_num)
+                yield from items
+        finally:
+            # Free the MuPDF document even if the consumer stops early
+            if doc is not None:
+                doc.close()
+
+    def _get_document(self, pdf_path: str) -> List:
+        """
+        The [document key, page count] entry of a file. Re-runs of a file are
+        recognised by path, size and mtime. A copy at another path can only
+        match a file of the same size, so contents are hashed only then and
+        never for a file seen once, e.g. on a one-shot batch run.
+        """
+        stat = os.stat(pdf_path)
+        stat_key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+
+        document = self._documents.get(stat_key)
+        if document is not None:
+            self._documents.move_to_end(stat_key)
+            return document
+
+        document = [stat_key, None]
+        for seen_key, seen in list(self._documents.items()):
+            if seen_key[1] != stat.st_size:
+                continue
+            digest = self._content_digest(stat_key)
+            if digest is not None and digest == self._content_digest(seen_key):
+                # Same bytes: share the other file's cached pages
+                document = [seen[0], seen[1]]
+                break
+
+        self._documents[stat_key] = document
+        if len(self._documents) > _DOC_CACHE_SIZE:
+            evicted_key, _ = self._documents.popitem(last=False)
+            self._digests.pop(evicted_key, None)
+        return document
+
+    def _content_digest(self, stat_key: Tuple) -> Optional[str]:
+        """Content hash of a file, or None if it changed since `stat_key` was taken"""
+        digest = self._digests.get(stat_key)
+        if digest is None:
+            path = stat_key[0]
+            try:
+                stat = os.stat(path)
+                if (stat.st_size, stat.st_mtime_ns) != stat_key[1:]:
+                    return None
+                digest = _file_digest(path)
+            except OSError:
+                return None
+            self._digests[stat_key] = digest
+        return digest
+
+    def _get_cached_page_items(self, doc_key: Tuple, page_num: int) -> Optional[List[TextItem]]:
+        """A page's items if this file's page was seen before"""
+        key = (doc_key, page_num)
+        items = self._page_cache.get(key)
+        if items is not None:
+            self._page_cache.move_to_end(key)
+        return items
+
+    def _extract_page_items(self, doc, doc_key: Tuple, page_num: int) -> List[TextItem]:
+        """Extract a page's items and cache them"""
+        key = (doc_key, page_num)
+        items = list(self._iter_page_items(doc[page_num], page_num + 1))
+        self._page_cache[key] = items
+        if len(self._page_cache) > _PAGE_CACHE_SIZE:
+            self._page_cache.popitem(last=False)
+        return items
+
+    def _iter_page_items(self, page, page_number: int) -> Iterator[TextItem]:
+        """Yield the text items of one page"""
+        # A single detailed pass gives both the block text and its fonts.
+        # Ligatures and original whitespace are not preserved: whitespace is
+        # normalised during cleaning anyway, and MuPDF skips that work.
+        # Every page takes this pass: building the text page is the cost, so
+        # "blocks" is no cheaper, pages without text are already near free,
+        # and a page assumed to be plain 12pt would skew the size statistics
+        textpage = page.get_textpage(flags=_TEXT_FLAGS)
+        text_dict = page.get_text("dict", textpage=textpage, sort=True)
+        # A generator's locals live until its last item is taken, so free the
+        # MuPDF text page now instead of after the block loop below
+        del textpage
+
+        for block in text_dict["blocks"]:
+            if "lines" not in block:
+                continue
 
-        return {'size': 12, 'font': '', 'is_bold': False}
+            x0, y0, x1, y1 = block["bbox"]
+            lines = block["lines"]
 
-    def bboxes_overlap(self, bbox1, bbox2) -> bool:
-        """Check if two bounding boxes overlap"""
-        return not (bbox1[2] < bbox2[0] or bbox2[2] < bbox1[0] or 
-                   bbox1[3] < bbox2[1] or bbox2[3] < bbox1[1])
+            # Clean up text
+            text = "\n".join(["".join([span["text"] for span in line["spans"]])
+                              for line in lines]).strip()
+            if not text or len(text) < 2:
+                continue
 
-    def clean_and_filter_text(self, text_items: List[Dict]) -> List[Dict]:
+            size = 0.0
+            font = ''
+            is_bold = False
+
+            # Font info is only worth computing for blocks cleaning will keep
+            rejected = self.reject_reason(text, y0)
+            if rejected is None:
+                sizes = []
+                fonts = []
+                for line in lines:
+                    for span in line["spans"]:
+                        if span["text"].strip():
+                            sizes.append(span["size"])
+                            fonts.append(span["font"])
+                            if span["flags"] & 16:  # Bold flag is 16 (2^4)
+                                is_bold = True
+
+                # Bucketed to half points: PDF float noise (11.998 vs 12.0) would
+                # otherwise make one logical size several distinct ones
+                size = round(sum(sizes) / len(sizes) * 2) / 2 if sizes else 12
+                font = Counter(fonts).most_common(1)[0][0] if fonts else ''
+
+            yield TextItem(
+                text=text,
+                page=page_number,
+                bbox=(x0, y0, x1, y1),
+                x=x0,
+                y=y0,
+                width=x1 - x0,
+                height=y1 - y0,
+                size=size,
+                font=font,
+                is_bold=is_bold,
+                block_no=block["number"],
+                rejected=rejected
+            )
+
+    def clean_and_filter_text(self, text_items: List[TextItem]) -> List[TextItem]:
         """Clean and filter text items"""
-        cleaned_items = []
+        return list(self.iter_clean_text(text_items))
 
+    def iter_clean_text(self, text_items: Iterable[TextItem]) -> Iterator[TextItem]:
+        """
+        Clean and filter text items lazily. Yielded text is stripped with
+        whitespace collapsed; title and heading stages rely on that.
+        """
         for item in text_items:
-            text = item['text'].strip()
-
-            # Skip very short texts
-            if len(text) < 2:
-                continue
-
-            # Skip obvious page headers/footers (common patterns)
-            if self.is_header_footer(text, item):
-                continue
-
-            # Skip just numbers or single characters
-            if re.match(r'^[0-9\s\-]+$', text) and len(text) < 10:
+            # Filtering was already decided at extraction time
+            if item.rejected is not None:
                 continue
 
             # Clean up text
-            text = re.sub(r'\s+', ' ', text)
-            item['text'] = text
-
-            cleaned_items.append(item)
-
-        return cleaned_items
-
-    def is_header_footer(self, text: str, item: Dict) -> bool:
+            yield item._replace(text=_WS_RE.sub(' ', item.text))
+
+    def reject_reason(self, text: str, y: float) -> Optional[str]:
+        """
+        Why cleaning would drop a block of stripped text, or None to keep it.
+        Texts under 2 characters never get here: extraction skips them.
+        """
+        # Skip obvious page headers/footers (common patterns)
+        if self.is_header_footer(text, y):
+            return 'header_footer'
+
+        # Skip just numbers or single characters
+        if len(text) < 10:
+            rest = text.translate(_NUM_ONLY_DELETE)
+            if not rest or rest.isspace():
+                return 'number'
+
+        return None
+
+    def is_header_footer(self, text: str, y: float) -> bool:
         """Detect if text is a header or footer"""
         page_height = 800  # Approximate page height
 
         # Position-based detection
-        if item['y'] > page_height * 0.9 or item['y'] < 50:
+        if y > page_height * 0.9 or y < 50:
             # Near top or bottom of page
             if (len(text) < 80 and 
                 ('RFP:' in text or 'March 2003' in text or 
-                 re.match(r'^\d+$', text.strip()) or
+                 text.strip().isdecimal() or
                  'Business Plan' in text)):
                 return True
 
         # Pattern-based detection
-        header_footer_patterns = [
-            r'^RFP: To Develop.*March 2003.*\d+$',
-            r'^\d+\s*$',  # Just page numbers
-            r'^March \d+, \d+$',  # Just dates
-        ]
-
-        for pattern in header_footer_patterns:
-            if re.match(pattern, text, re.IGNORECASE):
-                return True
+        return _HF_UNION.match(text) is not None
 
-        return False
-
-    def detect_title_advanced(self, text_items: List[Dict]) -> str:
+    def detect_title_advanced(self, text_items: List[TextItem]) -> str:
         """Advanced title detection"""
         if not text_items:
             return "Untitled Document"
 
         # Get first page items, sorted by position
-        first_page = [item for item in text_items if item['page'] == 1]
-        first_page.sort(key=lambda x: (x['y'], x['x']))
+        first_page = [item for item in text_items if item.page == 1]
+        first_page.sort(key=lambda x: (x.y, x.x))
 
         # Look for title in the first few substantial text blocks
         title_candidates = []
 
         for item in first_page[:8]:  # Check first 8 blocks
-            text = item['text'].strip()
-            size = item['size']
+            text = item.text.strip()
+            size = item.size
 
             # Must be substantial text
             if len(text) < 5:
                 continue
 
             # Skip obvious non-titles
-            if (text.lower().startswith(('page ', 'chapter ', 'section ')) or
-                re.match(r'^\d+\s*$', text) or
+            if (text.lower().startswith(_NON_TITLE_STARTERS) or
+                text.rstrip().isdecimal() or
                 'March 2003' in text):
                 continue
 
             # Check if this looks like a title
-            if (item['y'] < 300 and  # Upper part of page
+            if (item.y < 300 and  # Upper part of page
                 len(text) > 8 and
                 size >= 12):
-                title_candidates.append((text, size, item['y']))
+                title_candidates.append((text, size, item.y))
 
         if title_candidates:
             # Sort by font size (descending) then by position
@@ -188,8 +390,8 @@ class p_FinalPDFOutlineExtractor:
             # Try to find a coherent title
             best_candidate = title_candidates[0][0]
 
-            # Clean up the title
-            title = re.sub(r'\s+', ' ', best_candidate).strip()
+            # Cleaning already collapsed whitespace, so the text is the title
+            title = best_candidate
 
             # If title seems fragmented, try to find a better one
             if len(title.split()) > 15 or title.count(' ') > 20:
@@ -204,49 +406,74 @@ class p_FinalPDFOutlineExtractor:
         # Fallback
         return "Document"
 
-    def classify_headings_advanced(self, text_items: List[Dict]) -> List[Dict]:
+    def classify_headings_advanced(self, text_items: List[TextItem]) -> List[Dict]:
         """Advanced heading classification"""
         if not text_items:
             return []
 
         # Analyze font size distribution
-        sizes = [item['size'] for item in text_items if item['size'] > 0]
-        if not sizes:
+        size_stats = self.calculate_size_stats(
+            Counter(item.size for item in text_items if item.size > 0))
+        if not size_stats:
             return []
 
-        size_stats = {
-            'mean': statistics.mean(sizes),
-            'median': statistics.median(sizes),
-            'sizes': sorted(set(sizes), reverse=True)
+        return self.classify_candidates(text_items, size_stats)
+
+    def calculate_size_stats(self, size_counts: Counter) -> Optional[Dict]:
+        """Font size statistics from a size -> occurrence count histogram"""
+        if not size_counts:
+            return None
+
+        # Builtin reductions instead of statistics, which works in exact fractions;
+        # fsum is exact, so summing from the histogram equals summing every item
+        total = sum(size_counts.values())
+        mean = math.fsum(chain.from_iterable(
+            repeat(size, count) for size, count in size_counts.items())) / total
+
+        # No median: nothing downstream reads it
+        return {
+            'mean': mean,
+            'sizes': sorted(size_counts, reverse=True)
         }
 
+    def classify_candidates(self, text_items: Iterable[TextItem], size_stats: Dict) -> List[Dict]:
+        """Score and level the items that could be headings"""
         # Calculate thresholds more carefully
         thresholds = self.calculate_heading_thresholds(size_stats)
 
+        # Sizes repeat heavily, so the threshold comparisons behind the size
+        # bonus and base level run once per distinct size, not twice per item
+        size_classes = {}
+        mean_size = size_stats['mean']
+
         potential_headings = []
 
         for item in text_items:
-            text = item['text'].strip()
-            size = item['size']
-            is_bold = item.get('is_bold', False)
+            text = item.text.strip()
+            size = item.size
 
             # Pre-filtering
-            if not self.could_be_heading(text, size, size_stats['mean']):
+            if not self.could_be_heading(text, size, mean_size):
                 continue
 
+            size_class = size_classes.get(size)
+            if size_class is None:
+                size_class = size_classes[size] = self.classify_size(size, thresholds, size_stats)
+            size_bonus, base_level = size_class
+
             # Calculate confidence
-            confidence = self.calculate_confidence_advanced(item, thresholds, size_stats)
+            confidence = self.calculate_confidence_advanced(item, thresholds, size_stats, size_bonus)
 
             if confidence > 2.0:  # Higher threshold for better precision
-                level = self.determine_level_advanced(item, thresholds, size_stats)
+                level = self.determine_level_advanced(item, thresholds, size_stats, base_level)
 
                 potential_headings.append({
                     'level': level,
                     'text': text,
-                    'page': item['page'],
+                    'page': item.page,
                     'size': size,
                     'confidence': confidence,
-                    'y': item['y']
+                    'y': item.y
                 })
 
         # Post-process to remove duplicates and improve quality
@@ -254,14 +481,18 @@ class p_FinalPDFOutlineExtractor:
 
     def could_be_heading(self, text: str, size: float, mean_size: float) -> bool:
         """Quick check if text could possibly be a heading"""
-        # Length check
-        if len(text) < 3 or len(text) > 200:
-            return False
-
         # Size check
         if size < mean_size - 1:
             return False
 
+        return self.could_be_heading_text(text)
+
+    def could_be_heading_text(self, text: str) -> bool:
+        """The text-only part of could_be_heading, usable before sizes are known"""
+        # Length check
+        if len(text) < 3 or len(text) > 200:
+            return False
+
         # Content check
         if self.is_obviously_body_text(text):
             return False
@@ -275,7 +506,7 @@ class p_FinalPDFOutlineExtractor:
             return True
 
         # Starts with lowercase (except special cases)
-        if text and text[0].islower() and not text.startswith(('e-', 'i.e.', 'etc.')):
+        if text and text[0].islower() and not text.startswith(_LOWERCASE_HEADING_STARTERS):
             return True
 
         # Long paragraphs
@@ -283,8 +514,7 @@ class p_FinalPDFOutlineExtractor:
             return True
 
         # Common body text starters
-        body_starters = ['The ', 'This ', 'It ', 'We ', 'Our ', 'In order', 'For the']
-        if any(text.startswith(starter) for starter in body_starters):
+        if text.startswith(_BODY_STARTERS):
             return True
 
         return False
@@ -316,98 +546,81 @@ class p_FinalPDFOutlineExtractor:
                 'body': mean_size
             }
 
-    def calculate_confidence_advanced(self, item: Dict, thresholds: Dict, size_stats: Dict) -> float:
-        """Calculate advanced confidence score"""
-        text = item['text']
-        size = item['size']
-        is_bold = item.get('is_bold', False)
-
-        confidence = 0.0
-
-        # Size-based confidence
+    def classify_size(self, size: float, thresholds: Dict, size_stats: Dict) -> Tuple[float, str]:
+        """Size-based confidence bonus and initial heading level for a font size"""
         if size >= thresholds['h1']:
-            confidence += 3.5
+            return 3.5, "H1"
         elif size >= thresholds['h2']:
-            confidence += 2.5
+            return 2.5, "H2"
         elif size >= thresholds['h3']:
-            confidence += 1.5
+            return 1.5, "H3"
         elif size > size_stats['mean']:
-            confidence += 1.0
+            return 1.0, "H3"
+        else:
+            return 0.0, "H3"
+
+    def calculate_confidence_advanced(self, item: TextItem, thresholds: Dict, size_stats: Dict,
+                                      size_bonus: Optional[float] = None) -> float:
+        """Calculate advanced confidence score"""
+        text = item.text
+        length = len(text)  # Used by three checks below
+
+        # Size-based confidence
+        if size_bonus is None:
+            size_bonus = self.classify_size(item.size, thresholds, size_stats)[0]
+        confidence = size_bonus
 
         # Bold bonus
-        if is_bold:
+        if item.is_bold:
             confidence += 1.0
 
-        # Pattern recognition
-        if self.matches_heading_pattern(text):
+        # Pattern recognition (the fused pattern, without a method call per item)
+        if _HEADING_UNION.match(text) is not None:
             confidence += 2.0
 
         # Structure-based bonuses
         if text.endswith(':'):
             confidence += 1.0
 
-        if text.isupper() and 5 < len(text) < 50:
+        # Length bounds first: they are cheaper than scanning for case
+        if 5 < length < 50 and text.isupper():
             confidence += 1.0
 
         # Position-based (simple version)
-        if item['y'] < 100:  # Near top of page
+        if item.y < 100:  # Near top of page
             confidence += 0.5
 
         # Length-based adjustments
-        if 5 <= len(text) <= 80:
+        if 5 <= length <= 80:
             confidence += 0.5
-        elif len(text) > 150:
+        elif length > 150:
             confidence -= 1.5
 
         return confidence
 
     def matches_heading_pattern(self, text: str) -> bool:
         """Check for common heading patterns"""
-        patterns = [
-            r'^(Chapter|Section|Part|Appendix)\s+[IVX0-9]+',
-            r'^\d+\.\d*\s+[A-Z]',
-            r'^[A-Z][a-z]+.*:$',
-            r'^(Summary|Background|Introduction|Conclusion|Overview|Abstract)$',
-            r'^Phase\s+[IVX]+:?',
-            r'^Appendix\s+[A-Z]:',
-            r'^[A-Z][A-Z\s]+$',  # All caps
-            r'^(What|How|Why|Where|When)\s+[a-z]'
-        ]
-
-        for pattern in patterns:
-            if re.match(pattern, text):
-                return True
-
-        return False
+        return _HEADING_UNION.match(text) is not None
 
-    def determine_level_advanced(self, item: Dict, thresholds: Dict, size_stats: Dict) -> str:
+    def determine_level_advanced(self, item: TextItem, thresholds: Dict, size_stats: Dict,
+                                 base_level: Optional[str] = None) -> str:
         """Determine heading level with advanced logic"""
-        text = item['text']
-        size = item['size']
-
-        # Size-based initial classification
-        if size >= thresholds['h1']:
-            level = "H1"
-        elif size >= thresholds['h2']:
-            level = "H2"
-        elif size >= thresholds['h3']:
-            level = "H3"
-        else:
-            level = "H3"
+        text = item.text
 
-        # Content-based adjustments
-        if re.match(r'^Appendix\s+[A-Z]:', text):
-            level = "H2"
-        elif text in ["Summary", "Background", "Introduction", "Conclusion"]:
-            level = "H2"
+        # Content-based adjustments override the size, so check them first
+        if _APPENDIX_RE.match(text):
+            return "H2"
+        elif text in _SECTION_HEADINGS:
+            return "H2"
         elif text.startswith("For each") and text.endswith(":"):
-            level = "H4"
-        elif re.match(r'^\d+\.\d+\s+', text):
-            level = "H3"
-        elif re.match(r'^Phase\s+[IVX]+', text):
-            level = "H2"
+            return "H4"
+        elif _NUMBERED_SUB_RE.match(text):
+            return "H3"
+        elif _PHASE_RE.match(text):
+            return "H2"
 
-        return level
+        # Size-based classification
+        return base_level or self.classify_size(item.size, thresholds, size_stats)[1]
 
     def post_process_headings_advanced(self, headings: List[Dict]) -> List[Dict]:
         """Advanced post-processing of headings"""
@@ -420,23 +633,22 @@ class p_FinalPDFOutlineExtractor:
         # Remove near duplicates
         filtered_headings = []
         seen_texts = set()
+        seen_index = _SubstringIndex()
 
         for heading in headings:
-            text_normalized = re.sub(r'\s+', ' ', heading['text'].lower().strip())
+            # Heading text comes from cleaned items: already stripped and collapsed
+            text_normalized = heading['text'].lower()
 
             # Check for exact duplicates
             if text_normalized in seen_texts:
                 continue
 
             # Check for very similar texts (substring matches)
-            is_duplicate = False
-            for seen_text in seen_texts:
-                if (text_normalized in seen_text or seen_text in text_normalized) and len(text_normalized) > 10:
-                    is_duplicate = True
-                    break
+            is_duplicate = len(text_normalized) > 10 and seen_index.overlaps(text_normalized)
 
             if not is_duplicate:
                 seen_texts.add(text_normalized)
+                seen_index.add(text_normalized)
                 filtered_headings.append({
                     'level': heading['level'],
                     'text': heading['text'],
@@ -448,17 +660,29 @@ class p_FinalPDFOutlineExtractor:
     def extract_outline(self, pdf_path: str) -> Dict:
         """Main extraction method"""
         try:
-            # Extract text with layout
-            text_items = self.extract_text_with_layout(pdf_path)
-
-            # Clean and filter
-            clean_items = self.clean_and_filter_text(text_items)
-
-            # Detect title
-            title = self.detect_title_advanced(clean_items)
+            # Stream cleaned items once, keeping only the size histogram,
+            # the first page (for the title) and possible headings
+            item_count = 0
+            size_counts = Counter()
+            first_page = []
+            candidates = []
+
+            for item in self.iter_clean_text(self.iter_text_items(pdf_path)):
+                item_count += 1
+                if item.size > 0:
+                    size_counts[item.size] += 1
+                if item.page == 1:
+                    first_page.append(item)
+                # The size part of could_be_heading needs the final mean
+                if self.could_be_heading_text(item.text):
+                    candidates.append(item)
+
+            # Detect title (a document with nothing on page 1 falls back to "Document")
+            title = self.detect_title_advanced(first_page) if first_page or not item_count else "Document"
 
             # Classify headings
-            outline = self.classify_headings_advanced(clean_items)
+            size_stats = self.calculate_size_stats(size_counts)
+            outline = self.classify_candidates(candidates, size_stats) if size_stats else []
 
             return {
                 'title': title,
@@ -475,9 +699,22 @@ class p_FinalPDFOutlineExtractor:
                 'outline': []
             }
 
-def process_pdf_file(input_path: str, output_path: str):
+# One extractor per process, kept across files so its page cache and the
+# MuPDF font/glyph caches of the process stay warm between documents
+_extractor: Optional[p_FinalPDFOutlineExtractor] = None
+
+def _shared_extractor() -> p_FinalPDFOutlineExtractor:
+    """This process's extractor, created on first use"""
+    global _extractor
+    if _extractor is None:
+        _extractor = p_FinalPDFOutlineExtractor()
+    return _extractor
+
+def process_pdf_file(input_path: str, output_path: str,
+                     extractor: Optional[p_FinalPDFOutlineExtractor] = None):
     """Process a single PDF file"""
-    extractor = FinalPDFOutlineExtractor()
+    if extractor is None:
+        extractor = _shared_extractor()
 
     try:
         result = extractor.extract_outline(input_path)
@@ -502,13 +739,20 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
 
     if os.path.exists(input_dir):
+        input_paths = []
+        output_paths = []
         for filename in os.listdir(input_dir):
             if filename.lower().endswith('.pdf'):
-                input_path = os.path.join(input_dir, filename)
+                input_paths.append(os.path.join(input_dir, filename))
                 output_filename = filename.replace('.pdf', '.json')
-                output_path = os.path.join(output_dir, output_filename)
-
-                process_pdf_file(input_path, output_path)
+                output_paths.append(os.path.join(output_dir, output_filename))
+
+        # Files are independent, so extract them in parallel across CPU cores;
+        # each worker reuses one extractor for all the files it is given
+        if input_paths:
+            max_workers = min(len(input_paths), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(process_pdf_file, input_paths, output_paths))
     else:
         print(f"Input directory {input_dir} does not exist")
 